@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
-from typing import List, Tuple
-from sys import argv, exit, stderr
+from array import array
+from itertools import accumulate
+from typing import List, Tuple, Iterable, Iterator, BinaryIO, Set
+from sys import argv, exit, stderr, stdout
 
 expected_args = 2
 
@@ -59,14 +61,97 @@ def part2(instructions: List[Tuple[str, str]]):
                 x_register += int(arg)
 
 
-def main(input_file: str):
-    instructions = process_file(input_file)
-    print(f'Part 1: {part1(instructions)}')
-    part2(instructions)
+def compile_timeline(instructions: List[Tuple[str, str]]) -> array:
+    '''Turns the program into the value of the X register *during* every cycle: timeline[c] is X in cycle c
+    (index 0 is unused). Each addx drops its delta at the first cycle after it finishes, and a prefix sum
+    over those deltas gives the register'''
+    deltas = array('q', [1, 0])  # index 1 starts the running sum at X = 1
+    for instr, arg in instructions:
+        deltas.extend([0] * command_map[instr])
+        if instr == 'addx':
+            deltas[-1] = int(arg)
+    deltas.pop()  # the final delta lands after the last cycle
+    timeline = array('q', accumulate(deltas))
+    timeline[0] = 0
+    return timeline
+
+
+def signal_strength(timeline: array, cycles: Iterable[int]) -> int:
+    '''Sum of cycle * X over the requested cycles; cycles past the end of the program count for nothing'''
+    return sum(cycle * timeline[cycle] for cycle in cycles if 0 < cycle < len(timeline))
+
+
+def render(timeline: array, width: int = 40) -> List[str]:
+    '''The CRT rows drawn over the program, one pixel per cycle. A partial final row isn't drawn'''
+    rows = []
+    for start in range(1, len(timeline) - width + 1, width):
+        rows.append(''.join(
+            '#' if abs(timeline[start + pixel] - pixel) <= 1 else '.'
+            for pixel in range(width)
+        ))
+    return rows
+
+
+def iter_instructions(lines: Iterable[str]) -> Iterator[Tuple[int, int]]:
+    '''Lazily parses program lines into (number of cycles, delta applied once they finish)'''
+    for line in lines:
+        parts = line.split()
+        if parts:
+            yield command_map[parts[0]], int(parts[1]) if parts[0] == 'addx' else 0
+
+
+def iter_cycles(instructions: Iterable[Tuple[int, int]]) -> Iterator[int]:
+    '''Yields the X register during each cycle, in order, starting with cycle 1'''
+    x_register = 1
+    for num_ticks, delta in instructions:
+        for _ in range(num_ticks):
+            yield x_register
+        x_register += delta
+
+
+def run_pipeline(lines: Iterable[str], sample_cycles: Set[int], out: BinaryIO, width: int = 40, height: int = 6) -> int:
+    '''Streams the program through the CPU and the CRT in one pass and constant memory.
+    Pixels go into a framebuffer that is written to `out` with a single call per frame of `height` rows
+    (a trailing partial frame is flushed with its complete rows only). Returns the signal strength
+    summed over `sample_cycles`'''
+    row_len = width + 1
+    frame = bytearray(b'.' * (row_len * height))
+    frame[width::row_len] = b'\n' * height
+    signal = 0
+    pixel = 0
+    cycle = 0
+    for cycle, x_register in enumerate(iter_cycles(iter_instructions(lines)), start=1):
+        if cycle in sample_cycles:
+            signal += cycle * x_register
+        column = pixel % width
+        frame[(pixel // width) * row_len + column] = ord('#') if abs(x_register - column) <= 1 else ord('.')
+        pixel += 1
+        if pixel == width * height:
+            out.write(frame)
+            pixel = 0
+    if pixel >= width:
+        out.write(frame[:(pixel // width) * row_len])
+    return signal
+
+
+def main(input_file: str, stream: bool = False):
+    if stream:  # the picture comes out while the program runs, so part 1 is printed after it
+        with open(input_file, 'r') as infile:
+            strength = run_pipeline(infile, set(range(20, 221, 40)), stdout.buffer)
+        stdout.buffer.flush()
+        print(f'Part 1: {strength}')
+        return
+
+    timeline = compile_timeline(process_file(input_file))
+    print(f'Part 1: {signal_strength(timeline, range(20, 221, 40))}')
+    for row in render(timeline):
+        print(row)
 
 
 if __name__ == "__main__":
-    if len(argv) != expected_args:
-        print(f'ERROR: expected {expected_args - 1} arguments (input_file)', file=stderr)
+    stream = '--stream' in argv
+    args = [arg for arg in argv if arg != '--stream']
+    if len(args) != expected_args:
+        print(f'ERROR: expected {expected_args - 1} arguments (input_file [--stream])', file=stderr)
         exit(1)
-    main(argv[1])
+    main(args[1], stream)
@@ -4,12 +4,23 @@ from __future__ import annotations
 
 import json
 from math import prod
-from typing import Dict
-from collections import deque
+from typing import Dict, List, Tuple
+from collections import deque, namedtuple
 from sys import argv, exit, stderr
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for run_numpy_simulation
+    np = None
+
 expected_args = 2
 
+# opcodes for the compiled monkey programs. OP_SQUARE is the `old*old` case and ignores its operand
+OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_MOD, OP_SQUARE = range(6)
+OPCODES = {'+': OP_ADD, '-': OP_SUB, '*': OP_MUL, '/': OP_DIV, '%': OP_MOD}
+
+CompiledMonkey = namedtuple('CompiledMonkey', ['opcode', 'operand', 'divisor', 'if_true', 'if_false'])
+
 
 class Monkey(object):
 
@@ -24,18 +35,19 @@ class Monkey(object):
             return lambda x: x * x
 
         op_and_num = op_str.split('=')[1].split('old')[1]
+        num = int(op_and_num[1:])
 
         match op_and_num[0]:
             case '+':
-                return lambda x: x + int(op_and_num[1:])
+                return lambda x: x + num
             case '-':
-                return lambda x: x - int(op_and_num[1:])
+                return lambda x: x - num
             case '*':
-                return lambda x: x * int(op_and_num[1:])
+                return lambda x: x * num
             case '/':
-                return lambda x: x // int(op_and_num[1:])
+                return lambda x: x // num
             case '%':
-                return lambda x: x % int(op_and_num[1:])
+                return lambda x: x % num
 
     def __init__(self, monkey_dict: dict) -> Monkey:
         self.items = deque(monkey_dict['starting_items'])
@@ -70,6 +82,165 @@ class Monkey(object):
         self.items.append(item)
 
 
+def compile_operation(op_str: str) -> Tuple[int, int]:
+    '''Same input format as `Monkey.parse_operation`, but gives back an (opcode, operand) pair'''
+    expression = op_str.split('=')[1]
+    if expression == 'old*old':
+        return OP_SQUARE, 0
+    op_and_num = expression.split('old')[1]
+    return OPCODES[op_and_num[0]], int(op_and_num[1:])
+
+
+def compile_monkey(monkey_dict: dict) -> CompiledMonkey:
+    opcode, operand = compile_operation(monkey_dict['operation'])
+    _, divisor = compile_operation(monkey_dict['test']['operation'])
+    return CompiledMonkey(opcode, operand, divisor, int(monkey_dict['test']['true']), int(monkey_dict['test']['false']))
+
+
+def compile_input_file(input_file: str) -> Tuple[List[CompiledMonkey], List[List[int]]]:
+    '''Parses the json input once into monkey programs and the items each monkey starts with'''
+    with open(input_file, 'r') as infile:
+        monkeys_dict = json.load(infile)
+    programs = [compile_monkey(monkey) for monkey in monkeys_dict.values()]
+    items = [list(monkey['starting_items']) for monkey in monkeys_dict.values()]
+    return programs, items
+
+
+def run_compiled_simulation(programs: List[CompiledMonkey], items: List[List[int]], num_times: int, part1: bool) -> List[int]:
+    '''Interpreter loop over the compiled monkeys. `items` is updated in place;
+    returns the number of inspections per monkey'''
+    mod_val = prod(program.divisor for program in programs)
+    counts = [0] * len(programs)
+    for _ in range(num_times):
+        for ind, (opcode, operand, divisor, if_true, if_false) in enumerate(programs):
+            held = items[ind]
+            if not held:
+                continue
+            counts[ind] += len(held)
+            true_items, false_items = items[if_true], items[if_false]
+            for worry in held:
+                if opcode == OP_MUL:
+                    worry *= operand
+                elif opcode == OP_ADD:
+                    worry += operand
+                elif opcode == OP_SQUARE:
+                    worry *= worry
+                elif opcode == OP_SUB:
+                    worry -= operand
+                elif opcode == OP_DIV:
+                    worry //= operand
+                else:
+                    worry %= operand
+                if part1:
+                    worry //= 3
+                else:
+                    worry %= mod_val
+                if worry % divisor:
+                    false_items.append(worry)
+                else:
+                    true_items.append(worry)
+            held.clear()
+    return counts
+
+
+def _apply_operation_batch(worries, opcode: int, operand: int):
+    if opcode == OP_ADD:
+        return worries + operand
+    if opcode == OP_SUB:
+        return worries - operand
+    if opcode == OP_MUL:
+        return worries * operand
+    if opcode == OP_DIV:
+        return worries // operand
+    if opcode == OP_MOD:
+        return worries % operand
+    return worries * worries  # OP_SQUARE
+
+
+def _could_overflow(worries, opcode: int, operand: int) -> bool:
+    '''Whether applying the operation to this int64 batch might leave the int64 range'''
+    limit = int(np.iinfo(np.int64).max)
+    largest = max(abs(int(worries.max())), abs(int(worries.min())))
+    if opcode in (OP_ADD, OP_SUB):
+        return largest + abs(operand) > limit
+    if opcode == OP_MUL:
+        return largest * abs(operand) > limit
+    if opcode == OP_SQUARE:
+        return largest * largest > limit
+    return False  # division and modulo only shrink the values
+
+
+def run_numpy_simulation(programs: List[CompiledMonkey], items: List[List[int]], num_times: int, part1: bool) -> List[int]:
+    '''Batched version of `run_compiled_simulation`: every monkey's items are an int64 array, so a turn applies
+    the operation, reduction and test to all of them at once and splits them between the targets with a mask.
+    Before each batch the operation is checked against the int64 range, and if it could overflow every array
+    switches to Python ints (object dtype) for the rest of the run. That keeps the counts identical for both
+    parts, at the cost of speed once the worry levels get big (part 1 with `old*old` gets there quickly).
+    Item order within a monkey does not affect the counts'''
+    if np is None:
+        raise ImportError('numpy is required for the batched simulation')
+    mod_val = prod(program.divisor for program in programs)
+    dtype = np.int64 if max(mod_val, *(abs(program.operand) for program in programs)) <= np.iinfo(np.int64).max else object
+
+    held = [np.array(monkey_items, dtype=dtype) for monkey_items in items]
+    empty = np.empty(0, dtype=dtype)
+    counts = [0] * len(programs)
+    for _ in range(num_times):
+        for ind, (opcode, operand, divisor, if_true, if_false) in enumerate(programs):
+            worries = held[ind]
+            if not worries.size:
+                continue
+            counts[ind] += worries.size
+            if dtype is not object and _could_overflow(worries, opcode, operand):
+                dtype = object
+                held = [monkey_items.astype(object) for monkey_items in held]
+                empty = np.empty(0, dtype=object)
+                worries = held[ind]
+            worries = _apply_operation_batch(worries, opcode, operand)
+            if part1:
+                worries //= 3
+            else:
+                worries %= mod_val
+            divisible = worries % divisor == 0
+            held[ind] = empty
+            held[if_true] = np.concatenate((held[if_true], worries[divisible]))
+            held[if_false] = np.concatenate((held[if_false], worries[~divisible]))
+    return counts
+
+
+def to_residues(worry: int, divisors: List[int]) -> List[int]:
+    return [worry % divisor for divisor in divisors]
+
+
+def run_residue_simulation(programs: List[CompiledMonkey], items: List[List[int]], num_times: int) -> List[int]:
+    '''Part 2 rules without the combined `mod_val`: each item is stored as its residue modulo every monkey's
+    divisor, and each operation updates those residues independently, so the numbers involved never grow past
+    the largest divisor squared however many monkeys there are. Returns the number of inspections per monkey'''
+    divisors = [program.divisor for program in programs]
+    held = [[to_residues(worry, divisors) for worry in monkey_items] for monkey_items in items]
+    counts = [0] * len(programs)
+    for _ in range(num_times):
+        for ind, (opcode, operand, _, if_true, if_false) in enumerate(programs):
+            current = held[ind]
+            if not current:
+                continue
+            counts[ind] += len(current)
+            for residues in current:
+                if opcode == OP_MUL:
+                    residues = [(r * operand) % d for r, d in zip(residues, divisors)]
+                elif opcode == OP_ADD:
+                    residues = [(r + operand) % d for r, d in zip(residues, divisors)]
+                elif opcode == OP_SQUARE:
+                    residues = [(r * r) % d for r, d in zip(residues, divisors)]
+                elif opcode == OP_SUB:
+                    residues = [(r - operand) % d for r, d in zip(residues, divisors)]
+                else:  # division and modulo don't carry over to residues
+                    raise ValueError(f'Monkey {ind} uses an operation that cannot be done on residues')
+                held[if_true if residues[ind] == 0 else if_false].append(residues)
+            current.clear()
+    return counts
+
+
 def parse_input_file(input_file: str) -> Dict[Monkey]:
     monkeys = {}
     with open(input_file, 'r') as infile:
@@ -88,20 +259,77 @@ def run_simulation(monkeys: Dict[Monkey], num_times: int, part1: bool) -> None:
             print('.')
 
 
+def _item_round(monkeys: Dict[Monkey], holder: int, worry: int, part1: bool, mod_val: int) -> Tuple[int, int, List[int]]:
+    '''Follows one item through one round. Monkeys take turns in order, so an item thrown to a
+    later monkey is inspected again this round, and one thrown backwards waits for the next round.
+    Returns the item's (holder, worry) at the start of the next round and the monkeys that inspected it'''
+    inspected_by = []
+    while True:
+        monkey = monkeys[holder]
+        inspected_by.append(holder)
+        worry = monkey.operation(worry)
+        if part1:
+            worry //= 3
+        else:
+            worry %= mod_val
+        target = monkey.test[monkey.test['operation'](worry) == 0]
+        if target <= holder:
+            return target, worry, inspected_by
+        holder = target
+
+
+def run_item_simulation(monkeys: Dict[Monkey], num_times: int, part1: bool) -> None:
+    '''Same result as `run_simulation`, but each item is followed on its own. An item's path only depends
+    on (holder, worry), so once a state repeats the rest of its rounds are a known cycle and the
+    inspection counts can be extrapolated instead of simulated'''
+    mod_val = prod(monkey.test_val for monkey in monkeys.values())
+    totals = [0] * len(monkeys)
+
+    for start_holder, monkey in monkeys.items():
+        for worry in monkey.items:
+            seen: Dict[Tuple[int, int], int] = {}
+            rounds: List[List[int]] = []  # who inspected the item in each simulated round
+            state = (start_holder, worry)
+            while len(rounds) < num_times and state not in seen:
+                seen[state] = len(rounds)
+                holder, worry, inspected_by = _item_round(monkeys, *state, part1, mod_val)
+                rounds.append(inspected_by)
+                state = (holder, worry)
+
+            for inspected_by in rounds:
+                for holder in inspected_by:
+                    totals[holder] += 1
+            if len(rounds) == num_times:
+                continue
+
+            # rounds[cycle_start:] repeat forever from here on
+            cycle_start = seen[state]
+            cycle = rounds[cycle_start:]
+            full_cycles, leftover = divmod(num_times - len(rounds), len(cycle))
+            for inspected_by in cycle:
+                for holder in inspected_by:
+                    totals[holder] += full_cycles
+            for inspected_by in cycle[:leftover]:
+                for holder in inspected_by:
+                    totals[holder] += 1
+
+    for ind, monkey in monkeys.items():
+        monkey.num_inspections += totals[ind]
+        monkey.items.clear()
+
+
 def main(input_file: str):
     if '.json' not in input_file:
         print('ERROR: expected input file to be a json file', file=stderr)
         exit(1)
 
-    monkeys = parse_input_file(input_file)
-    run_simulation(monkeys, 20, True)
-
-    num_inspections = [m.num_inspections for m in monkeys.values()]
+    programs, items = compile_input_file(input_file)
+    num_inspections = run_compiled_simulation(programs, items, 20, True)
     num_inspections.sort(reverse=True)
     print(f'Part 1: {prod(num_inspections[:2])}')
 
     monkeys = parse_input_file(input_file)
-    run_simulation(monkeys, 10_000, False)
+    run_item_simulation(monkeys, 10_000, False)
 
     num_inspections = [m.num_inspections for m in monkeys.values()]
     num_inspections.sort(reverse=True)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
-from typing import List, Tuple
+from array import array
+from typing import List, Tuple, Dict, Optional
 from string import ascii_lowercase
 from sys import argv, exit, stderr
 from collections import namedtuple, deque
@@ -10,6 +11,10 @@ expected_args = 2
 Point = namedtuple('Point', ['x', 'y'])
 Grid = List[List[str]]
 
+LETTER_TO_HEIGHT = {letter: num for (letter, num) in zip(ascii_lowercase, range(26))}
+LETTER_TO_HEIGHT['S'] = 0
+LETTER_TO_HEIGHT['E'] = 25
+
 
 def create_grid(input_file: str) -> Tuple[Grid, Point, Point]:
     result: List[List[str]] = []
@@ -58,25 +63,135 @@ def BFS(grid: Grid, start: Point, end: Point) -> int:
     return 1_000_000_000  # no path exists
 
 
+def reverse_BFS(grid: Grid, end: Point) -> Dict[Point, int]:
+    '''Searches backwards from `end` using the inverted climb rule (a step down may be at most 1),
+    giving the distance to `end` from every cell that can reach it'''
+    distances = {end: 0}
+    queue = deque([end])
+
+    while len(queue):
+        current = queue.popleft()
+        current_height = letter_to_height(grid[current.x][current.y])
+        dist = distances[current] + 1
+
+        for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            prev = Point(dx + current.x, dy + current.y)
+            if prev not in distances and point_in_bounds(prev, grid):
+                if current_height - letter_to_height(grid[prev.x][prev.y]) <= 1:
+                    distances[prev] = dist
+                    queue.append(prev)
+    return distances
+
+
+def nearest_with_height(grid: Grid, distances: Dict[Point, int], height: int) -> Optional[Tuple[Point, int]]:
+    '''Finds the cell of the given height closest to the end of the distance field, if any can reach it'''
+    candidates = [(dist, point) for point, dist in distances.items() if letter_to_height(grid[point.x][point.y]) == height]
+    if not candidates:
+        return None
+    dist, point = min(candidates)
+    return point, dist
+
+
 def letter_to_height(ltr: str) -> int:
-    letter_to_height_map = {letter: num for (letter, num) in zip(ascii_lowercase, range(26))}
-    letter_to_height_map['S'] = 0
-    letter_to_height_map['E'] = 25
-    return letter_to_height_map[ltr]
+    return LETTER_TO_HEIGHT[ltr]
+
+
+class FlatHeightmap:
+    '''Compact version of the grid: heights live in a bytearray indexed by `x * width + y`, and the legal
+    moves are precomputed into a CSR table (`offsets`/`targets`) so searches never touch letters or tuples'''
+
+    def __init__(self, rows: List[bytes]):
+        self.rows = len(rows)
+        self.width = len(rows[0]) if rows else 0
+        self.heights = bytearray(self.rows * self.width)
+        self.start, self.end = -1, -1
+        translate = bytes.maketrans(ascii_lowercase.encode() + b'SE', bytes(range(26)) + bytes([0, 25]))
+        for x, row in enumerate(rows):
+            if len(row) != self.width:
+                raise ValueError(f'Row {x} is {len(row)} cells wide, expected {self.width}')
+            base = x * self.width
+            if (col := row.find(b'S')) != -1:
+                self.start = base + col
+            if (col := row.find(b'E')) != -1:
+                self.end = base + col
+            self.heights[base:base + self.width] = row.translate(translate)
+        if self.start == -1 or self.end == -1:
+            raise ValueError('Heightmap needs both a start (S) and an end (E)')
+
+    @classmethod
+    def from_file(cls, input_file: str) -> 'FlatHeightmap':
+        with open(input_file, 'rb') as infile:
+            return cls([line.strip() for line in infile if line.strip()])
+
+    @classmethod
+    def from_grid(cls, grid: Grid) -> 'FlatHeightmap':
+        return cls([''.join(row).encode() for row in grid])
+
+    def index(self, point: Point) -> int:
+        return point.x * self.width + point.y
+
+    def point(self, idx: int) -> Point:
+        return Point(*divmod(idx, self.width))
+
+    def adjacency(self, reverse: bool = False) -> Tuple[array, array]:
+        '''CSR table of legal moves: the neighbours of cell i are targets[offsets[i]:offsets[i + 1]].
+        With `reverse`, the table holds the cells that can step *into* i instead'''
+        heights, width, size = self.heights, self.width, len(self.heights)
+        offsets = array('i', [0]) * (size + 1)
+        targets = array('i')
+        for i in range(size):
+            h = heights[i]
+            x, y = divmod(i, width)
+            for nxt, ok in ((i - width, x > 0), (i + width, x < self.rows - 1), (i - 1, y > 0), (i + 1, y < width - 1)):
+                if ok and ((h - heights[nxt]) if reverse else (heights[nxt] - h)) <= 1:
+                    targets.append(nxt)
+            offsets[i + 1] = len(targets)
+        return offsets, targets
+
+    def bfs(self, source: int, reverse: bool = False) -> array:
+        '''Distance from `source` to every cell (-1 if unreachable). A reverse search gives distance *to* source'''
+        offsets, targets = self.adjacency(reverse)
+        size = len(self.heights)
+        distances = array('i', [-1]) * size  # doubles as the visited map: -1 means not reached yet
+        queue = array('i', [0]) * size
+        queue[0], head, tail = source, 0, 1
+        distances[source] = 0
+        while head < tail:
+            current = queue[head]
+            head += 1
+            dist = distances[current] + 1
+            for k in range(offsets[current], offsets[current + 1]):
+                nxt = targets[k]
+                if distances[nxt] == -1:
+                    distances[nxt] = dist
+                    queue[tail] = nxt
+                    tail += 1
+        return distances
+
+    def nearest_with_height(self, distances: array, height: int) -> Optional[Tuple[Point, int]]:
+        '''The cell of `height` closest to the source of a distance field and its distance,
+        or None if no cell of that height is reached'''
+        heights = self.heights
+        best, best_ind = -1, -1
+        for i, dist in enumerate(distances):
+            if dist != -1 and heights[i] == height and (best == -1 or dist < best):
+                best, best_ind = dist, i
+        if best_ind == -1:
+            return None
+        return self.point(best_ind), best
 
 
 def main(input_file: str):
-    grid, start, end = create_grid(input_file)
+    heightmap = FlatHeightmap.from_file(input_file)
 
-    print(f'Part 1: {BFS(grid, start, end)}')
+    # a single search from the end gives the distance from every cell, so both parts are lookups
+    distances = heightmap.bfs(heightmap.end, reverse=True)
 
-    # Construct a list of all possible starting points (points with height 0)
-    starting_points = [Point(x, y) for x in range(len(grid)) for y in range(len(grid[0])) if letter_to_height(grid[x][y]) == 0]
+    part1 = distances[heightmap.start]
+    print(f'Part 1: {part1 if part1 != -1 else 1_000_000_000}')
 
-    # for each point, run BFS to get distance to end. Then, sort and pick the shortest
-    part2_distances = [BFS(grid, start_point, end) for start_point in starting_points]
-    part2_distances.sort()
-    part2 = part2_distances[0]
+    nearest = heightmap.nearest_with_height(distances, 0)
+    part2 = nearest[1] if nearest else 1_000_000_000
     print(f'Part 2: {part2}')
 
 
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+from heapq import heappush, heappop
+from collections import namedtuple, deque
+from sys import argv, exit, stderr
+from typing import Dict, Iterator
+
+from day12 import Grid, Point, create_grid, letter_to_height, point_in_bounds
+
+expected_args = 2
+
+NO_PATH = 1_000_000_000
+
+PathResult = namedtuple('PathResult', ['distance', 'expanded'])
+
+
+def neighbors(grid: Grid, current: Point, reverse: bool = False) -> Iterator[Point]:
+    '''Cells reachable in one step from `current` under the climb rule.
+    With `reverse`, gives the cells that can step *into* `current` instead'''
+    current_height = letter_to_height(grid[current.x][current.y])
+    for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        nxt = Point(dx + current.x, dy + current.y)
+        if point_in_bounds(nxt, grid):
+            climb = letter_to_height(grid[nxt.x][nxt.y]) - current_height
+            if (-climb if reverse else climb) <= 1:
+                yield nxt
+
+
+def bfs(grid: Grid, start: Point, end: Point) -> PathResult:
+    distances = {start: 0}
+    queue = deque([start])
+    expanded = 0
+    while len(queue):
+        current = queue.popleft()
+        expanded += 1
+        if current == end:
+            return PathResult(distances[current], expanded)
+        for nxt in neighbors(grid, current):
+            if nxt not in distances:
+                distances[nxt] = distances[current] + 1
+                queue.append(nxt)
+    return PathResult(NO_PATH, expanded)
+
+
+def heuristic(grid: Grid, point: Point, end: Point, end_height: int) -> int:
+    '''Every step moves one cell and climbs at most one level, so both the manhattan distance
+    and the height still to climb are lower bounds on the remaining path'''
+    manhattan = abs(end.x - point.x) + abs(end.y - point.y)
+    return max(manhattan, end_height - letter_to_height(grid[point.x][point.y]))
+
+
+def a_star(grid: Grid, start: Point, end: Point) -> PathResult:
+    end_height = letter_to_height(grid[end.x][end.y])
+    distances = {start: 0}
+    heap = [(heuristic(grid, start, end, end_height), 0, start)]
+    closed = set()
+    expanded = 0
+    while heap:
+        _, dist, current = heappop(heap)
+        if current in closed:
+            continue
+        closed.add(current)
+        expanded += 1
+        if current == end:
+            return PathResult(dist, expanded)
+        for nxt in neighbors(grid, current):
+            if nxt not in closed and dist + 1 < distances.get(nxt, NO_PATH):
+                distances[nxt] = dist + 1
+                heappush(heap, (dist + 1 + heuristic(grid, nxt, end, end_height), dist + 1, nxt))
+    return PathResult(NO_PATH, expanded)
+
+
+def bidirectional_bfs(grid: Grid, start: Point, end: Point) -> PathResult:
+    '''Grows a forward search from `start` and a reverse search from `end`, one whole level at a time
+    on whichever side has the smaller frontier, and stops at the first level where they meet'''
+    if start == end:
+        return PathResult(0, 1)
+    forward: Dict[Point, int] = {start: 0}
+    backward: Dict[Point, int] = {end: 0}
+    forward_frontier, backward_frontier = [start], [end]
+    expanded = 0
+    while forward_frontier and backward_frontier:
+        reverse = len(backward_frontier) < len(forward_frontier)
+        frontier, seen, other = (backward_frontier, backward, forward) if reverse else (forward_frontier, forward, backward)
+        next_frontier = []
+        best = NO_PATH
+        for current in frontier:
+            expanded += 1
+            for nxt in neighbors(grid, current, reverse):
+                if nxt in seen:
+                    continue
+                seen[nxt] = seen[current] + 1
+                next_frontier.append(nxt)
+                if nxt in other:
+                    best = min(best, seen[nxt] + other[nxt])
+        if best != NO_PATH:
+            return PathResult(best, expanded)
+        if reverse:
+            backward_frontier = next_frontier
+        else:
+            forward_frontier = next_frontier
+    return PathResult(NO_PATH, expanded)
+
+
+STRATEGIES = {
+    'bfs': bfs,
+    'astar': a_star,
+    'bidirectional': bidirectional_bfs,
+}
+
+
+def shortest_path(grid: Grid, start: Point, end: Point, strategy: str = 'bfs') -> PathResult:
+    '''Length of the shortest climb from `start` to `end` (NO_PATH if there isn't one),
+    along with the number of nodes the chosen strategy expanded to find it'''
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy {strategy}, expected one of {", ".join(STRATEGIES)}')
+    return STRATEGIES[strategy](grid, start, end)
+
+
+def main(input_file: str):
+    grid, start, end = create_grid(input_file)
+    for strategy in STRATEGIES:
+        distance, expanded = shortest_path(grid, start, end, strategy)
+        print(f'{strategy}: distance {distance}, expanded {expanded} nodes')
+
+
+if __name__ == "__main__":
+    if len(argv) != expected_args:
+        print(f'ERROR: expected {expected_args - 1} arguments (input_file)', file=stderr)
+        exit(1)
+    main(argv[1])
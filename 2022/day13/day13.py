@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 
 from math import prod
-from json import loads
-from typing import Union
-from functools import cmp_to_key
+from typing import Union, List, Tuple
 from sys import argv, exit, stderr
 
 expected_args = 2
 
+# token values for brackets in the raw packet scanner and sort keys; packet integers are never negative.
+# CLOSE has to be the smallest so that a list running out first compares lower
+OPEN, CLOSE = -1, -2
+
 
 def compare_lines(left: Union[int, list], right: Union[int, list]) -> int:
     '''C-style comparator function comparing entries.\n
@@ -27,25 +29,121 @@ def compare_lines(left: Union[int, list], right: Union[int, list]) -> int:
     return len(left) - len(right)  # ensure that left is shorter
 
 
+def _next_token(packet: str, pos: int, pending: List[int]) -> Tuple[int, int]:
+    '''Reads the next token (an int, OPEN or CLOSE) from `packet` starting at `pos`, skipping commas.
+    Tokens in `pending` come first; they are the rest of an int that is being treated as a list'''
+    if pending:
+        return pending.pop(), pos
+    char = packet[pos]
+    while char == ',':
+        pos += 1
+        char = packet[pos]
+    if char == '[':
+        return OPEN, pos + 1
+    if char == ']':
+        return CLOSE, pos + 1
+    end = pos + 1
+    while packet[end].isdigit():
+        end += 1
+    return int(packet[pos:end]), end
+
+
+def compare_raw(left: str, right: str) -> int:
+    '''Same ordering as `compare_lines` (negative, zero or positive), but walks the two packet strings
+    token by token instead of parsing them. An int compared against a list is wrapped virtually: the list
+    side steps into the list and the int side is replayed as "int ]". Stops at the first difference'''
+    left_pos, right_pos = 0, 0
+    left_pending: List[int] = []
+    right_pending: List[int] = []
+    while left_pos < len(left) or left_pending:
+        if right_pos >= len(right) and not right_pending:
+            return 1
+        lf, left_pos = _next_token(left, left_pos, left_pending)
+        rh, right_pos = _next_token(right, right_pos, right_pending)
+        if lf == rh:
+            continue
+        if lf == CLOSE:  # left list ran out first
+            return -1
+        if rh == CLOSE:
+            return 1
+        if lf == OPEN:  # list vs int
+            right_pending.extend((CLOSE, rh))
+        elif rh == OPEN:  # int vs list
+            left_pending.extend((CLOSE, lf))
+        else:
+            return -1 if lf < rh else 1
+    return 0 if right_pos >= len(right) and not right_pending else -1
+
+
 def part1(lines) -> int:
     ans = []
     for ind, (left, right) in enumerate(lines):
-        if compare_lines(left, right) <= 0:
+        if compare_raw(left, right) <= 0:
             ans.append(ind + 1)
     return sum(ans)
 
 
+def divider_positions(packets: List[str], dividers: List[str]) -> List[int]:
+    '''1-based position each divider would have if `packets` and `dividers` were sorted together,
+    found by counting what compares below it rather than sorting'''
+    positions = []
+    for divider in dividers:
+        below = sum(1 for packet in packets if compare_raw(packet, divider) < 0)
+        below += sum(1 for other in dividers if compare_raw(other, divider) < 0)
+        positions.append(below + 1)
+    return positions
+
+
+def max_depth(packet: str) -> int:
+    depth, deepest = 0, 0
+    for char in packet:
+        if char == '[':
+            depth += 1
+            deepest = max(deepest, depth)
+        elif char == ']':
+            depth -= 1
+    return deepest
+
+
+def packet_key(packet: str, depth: int) -> Tuple[int, ...]:
+    '''Flattens a packet into a tuple that sorts natively in the same order as `compare_raw`.
+    An int is worth the same as a list holding only it, so every int is wrapped until it sits at `depth`
+    (the deepest nesting across all packets being sorted). Ints then only ever line up against ints or
+    CLOSE, and CLOSE being the smallest token makes a list that runs out first sort first'''
+    key = []
+    current = 0
+    pos = 0
+    while pos < len(packet):
+        char = packet[pos]
+        if char == '[':
+            key.append(OPEN)
+            current += 1
+        elif char == ']':
+            key.append(CLOSE)
+            current -= 1
+        elif char.isdigit():
+            end = pos + 1
+            while packet[end].isdigit():
+                end += 1
+            padding = depth - current
+            key.extend([OPEN] * padding)
+            key.append(int(packet[pos:end]))
+            key.extend([CLOSE] * padding)
+            pos = end
+            continue
+        pos += 1
+    return tuple(key)
+
+
+def sort_packets(packets: List[str]) -> List[str]:
+    depth = max((max_depth(packet) for packet in packets), default=0)
+    return sorted(packets, key=lambda packet: packet_key(packet, depth))
+
+
 def part2(lines) -> int:
-    dividers = [[[2]], [[6]]]
+    dividers = ['[[2]]', '[[6]]']
     packets = [packet for group in lines for packet in group]
-    packets.extend(dividers)
-    packets.sort(key=cmp_to_key(compare_lines))
-
-    ans = []
-    for ind, packet in enumerate(packets):
-        if packet in dividers:
-            ans.append(ind + 1)
-    return prod(ans)
+    return prod(divider_positions(packets, dividers))
 
 
 def main(input_file: str):
@@ -55,7 +153,7 @@ def main(input_file: str):
             tmp = tmp[:-1]
         tmp = [group.splitlines() for group in tmp]
 
-    lines = [[loads(s) for s in group] for group in tmp]
+    lines = [[s.strip() for s in group] for group in tmp]
 
     print(f'Part 1: {part1(lines)}')
     print(f'Part 2: {part2(lines)}')
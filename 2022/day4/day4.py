@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 
 import csv
+from array import array
 from typing import List, Tuple
 from sys import argv, exit, stderr
 
+try:
+    import numpy as np
+except ImportError:  # without numpy the columnar mode falls back to plain arrays
+    np = None
+
 
 def parse_input_file(filename: str) -> List[Tuple[int, int, int, int]]:
     output = []
@@ -18,29 +24,62 @@ def parse_input_file(filename: str) -> List[Tuple[int, int, int, int]]:
     return output
 
 
-def main(filename: str):
-    values = parse_input_file(filename)
+def fully_contains(s1: int, e1: int, s2: int, e2: int) -> bool:
+    '''Whether one inclusive range contains the other. An empty range (start > end) is contained by anything'''
+    if s1 > e1 or s2 > e2:
+        return True
+    return (s1 <= s2 and e2 <= e1) or (s2 <= s1 and e1 <= e2)
+
+
+def overlaps(s1: int, e1: int, s2: int, e2: int) -> bool:
+    '''Whether two inclusive ranges share at least one section'''
+    return max(s1, s2) <= min(e1, e2) and s1 <= e1 and s2 <= e2
+
+
+def load_columns(filename: str) -> Tuple[array, array, array, array]:
+    '''Loads the whole file in bulk as four columns: start1, end1, start2, end2.
+    They are numpy arrays when numpy is available, and array('q') otherwise'''
+    with open(filename, 'rb') as infile:
+        flat = array('q', map(int, infile.read().replace(b'-', b' ').replace(b',', b' ').split()))
+    if np is not None:
+        table = np.frombuffer(flat, dtype=np.int64).reshape(-1, 4)
+        return table[:, 0], table[:, 1], table[:, 2], table[:, 3]
+    return flat[0::4], flat[1::4], flat[2::4], flat[3::4]
+
+
+def count_columnar(s1, e1, s2, e2) -> Tuple[int, int]:
+    '''Both totals over every row at once. Vectorized with numpy, otherwise a loop over the columns'''
+    if np is not None and isinstance(s1, np.ndarray):
+        empty = (s1 > e1) | (s2 > e2)
+        contained = empty | ((s1 <= s2) & (e2 <= e1)) | ((s2 <= s1) & (e1 <= e2))
+        overlapping = ~empty & (np.maximum(s1, s2) <= np.minimum(e1, e2))
+        return int(contained.sum()), int(overlapping.sum())
+    rows = list(zip(s1, e1, s2, e2))
+    return sum(fully_contains(*row) for row in rows), sum(overlaps(*row) for row in rows)
 
-    part1total, part2total = 0, 0
-    # Idea here: we make sets of the ranges and look for
-    # the overlap. This means our ranges have to be inclusive
-    # s = start, e = end
-    for s1, e1, s2, e2 in values:
-        range1 = set(range(s1, e1 + 1))
-        range2 = set(range(s2, e2 + 1))
 
-        # how many overlaps are complete?
-        if range1 <= range2 or range2 <= range1:
-            part1total += 1
-        # how many ranges overlap at all?
-        if range1 & range2:
-            part2total += 1
+def main(filename: str, columnar: bool = False):
+    if columnar:
+        part1total, part2total = count_columnar(*load_columns(filename))
+    else:
+        part1total, part2total = 0, 0
+        # the ranges are inclusive, so both questions only need their endpoints
+        # s = start, e = end
+        for s1, e1, s2, e2 in parse_input_file(filename):
+            # how many overlaps are complete?
+            if fully_contains(s1, e1, s2, e2):
+                part1total += 1
+            # how many ranges overlap at all?
+            if overlaps(s1, e1, s2, e2):
+                part2total += 1
     print(f'Part 1 total: {part1total}')
     print(f'Part 2 total: {part2total}')
 
 
 if __name__ == '__main__':
-    if len(argv) != 2:
-        print("ERROR: Expected 1 argument (filename)", file=stderr)
+    columnar = '--columnar' in argv
+    args = [arg for arg in argv if arg != '--columnar']
+    if len(args) != 2:
+        print("ERROR: Expected 1 argument (filename) [--columnar]", file=stderr)
         exit(1)
-    main(argv[1])
+    main(args[1], columnar)
@@ -1,63 +1,121 @@
 #!/usr/bin/env python3
 
-from typing import Tuple
+from array import array
+from typing import Tuple, List, Dict
 from sys import argv, exit, stderr
 from collections import defaultdict
 
 
 def parse_instruction_line(instruction: str) -> Tuple[int, str, str]:
-    parsed_instruction = instruction.split(";")
-    number_of_crates = parsed_instruction[0]
-    starting_stack = parsed_instruction[1].split("->")[0]
-    destination_stack = parsed_instruction[1].split("->")[1]
+    number_of_crates, _, route = instruction.partition(";")
+    starting_stack, _, destination_stack = route.partition("->")
     return int(number_of_crates), starting_stack, destination_stack
 
 
 def parse_state_line(state_input_line: str) -> Tuple[str, str]:
-    crate_number = state_input_line.split(":")[0]
-    crates = state_input_line.split(":")[1]
+    crate_number, _, crates = state_input_line.partition(":")
     return crate_number, crates
 
 
-def main(state_file: str, instructions_file: str, part1: bool = True):
-    movement_stack = []
-    stacks_dict = defaultdict(list)
+Stacks = Dict[str, List[str]]
+
 
-    # first, parse the state file to populate the stacks dict
+def parse_state_file(state_file: str) -> Stacks:
+    stacks_dict = defaultdict(list)
     with open(state_file, 'r') as state_input:
         # each line is formatted "#:crate1,crate2,...,crate N"
         for line in state_input:
             crate_number, crates = parse_state_line(line.rstrip())
-            for crate in crates.split(","):
-                stacks_dict[crate_number].append(crate)
+            stacks_dict[crate_number].extend(crates.split(","))
+    return stacks_dict
+
 
-    # next, run through the instruction file manipulating the crates as necessary
+def parse_instructions_file(instructions_file: str) -> List[Tuple[int, str, str]]:
     with open(instructions_file, 'r') as instructions:
         # each line is formatted "number of crates;starting stack -> destination stack"
-        for instruction in instructions:
-            number_of_crates, starting_stack, destination_stack = parse_instruction_line(instruction.rstrip())
+        return [parse_instruction_line(instruction.rstrip()) for instruction in instructions if instruction.strip()]
 
-            # difference between part 1 and part 2
-            # in part 1, the we pop from starting and push to destination immediately
-            # in part 2, we pop all crates from starting first, then push them all to destination afterwards
-            for _ in range(number_of_crates):
-                movement_stack.append(stacks_dict[starting_stack].pop())
-                if part1:
-                    stacks_dict[destination_stack].append(movement_stack.pop())
-            if not part1:
-                for _ in range(number_of_crates):
-                    stacks_dict[destination_stack].append(movement_stack.pop())
 
-    output = ''
-    for stack in stacks_dict.values():
-        output += stack[-1]
+def apply_instructions(stacks_dict: Stacks, instructions: List[Tuple[int, str, str]], part1: bool) -> None:
+    '''Moves each batch of crates with a single slice.
+    In part 1 (CrateMover 9000) crates move one at a time, so the batch lands reversed;
+    in part 2 (CrateMover 9001) they move together and keep their order'''
+    for number_of_crates, starting_stack, destination_stack in instructions:
+        source = stacks_dict[starting_stack]
+        if number_of_crates > len(source):
+            raise IndexError(f'Cannot move {number_of_crates} crates from stack {starting_stack} holding {len(source)}')
+        moved = source[len(source) - number_of_crates:]
+        del source[len(source) - number_of_crates:]
+        stacks_dict[destination_stack].extend(moved[::-1] if part1 else moved)
+
+
+def top_of_stacks(stacks_dict: Stacks) -> str:
+    return ''.join(stack[-1] for stack in stacks_dict.values() if stack)
+
+
+def parse_state_file_compact(state_file: str) -> Tuple[List[bytearray], List[int]]:
+    '''Stacks as bytearrays (one byte per crate) indexed by their integer stack number,
+    along with the stack numbers in the order the file lists them'''
+    parsed = {}
+    with open(state_file, 'rb') as state_input:
+        for line in state_input:
+            crate_number, _, crates = line.rstrip().partition(b":")
+            stack = crates.replace(b",", b"")
+            if crates and len(stack) != crates.count(b",") + 1:
+                raise ValueError(f'Stack {crate_number.decode()} has crates that are not a single character')
+            parsed[int(crate_number)] = bytearray(stack)
+    stacks = [bytearray() for _ in range(max(parsed, default=0) + 1)]
+    for number, stack in parsed.items():
+        stacks[number] = stack
+    return stacks, list(parsed)
 
-    print(f'Values on top of stacks: {output}')
+
+def parse_instructions_file_compact(instructions_file: str) -> array:
+    '''Parses the whole instruction file in bulk into a flat array of (count, source, destination) triples'''
+    with open(instructions_file, 'rb') as instructions:
+        data = instructions.read()
+    return array('i', map(int, data.replace(b"->", b" ").replace(b";", b" ").split()))
+
+
+def apply_instructions_compact(stacks: List[bytearray], moves: array, part1: bool) -> None:
+    '''`apply_instructions` over the compact representation'''
+    for ind in range(0, len(moves), 3):
+        number_of_crates, starting_stack, destination_stack = moves[ind], moves[ind + 1], moves[ind + 2]
+        source = stacks[starting_stack]
+        if number_of_crates > len(source):
+            raise IndexError(f'Cannot move {number_of_crates} crates from stack {starting_stack} holding {len(source)}')
+        moved = source[len(source) - number_of_crates:]
+        del source[len(source) - number_of_crates:]
+        stacks[destination_stack] += moved[::-1] if part1 else moved
+
+
+def run_both_parts(state_file: str, instructions_file: str) -> Tuple[str, str]:
+    '''Both answers from a single parse of the input files'''
+    stacks, order = parse_state_file_compact(state_file)
+    moves = parse_instructions_file_compact(instructions_file)
+    answers = []
+    for part1 in (True, False):
+        working = [bytearray(stack) for stack in stacks]
+        apply_instructions_compact(working, moves, part1)
+        answers.append(b''.join(bytes(working[number][-1:]) for number in order).decode())
+    return answers[0], answers[1]
+
+
+def main(state_file: str, instructions_file: str, part1: bool = True):
+    stacks_dict = parse_state_file(state_file)
+    apply_instructions(stacks_dict, parse_instructions_file(instructions_file), part1)
+    print(f'Values on top of stacks: {top_of_stacks(stacks_dict)}')
 
 
 if __name__ == '__main__':
+    if len(argv) == 4 and argv[3] == '--both':
+        part1_answer, part2_answer = run_both_parts(argv[1], argv[2])
+        print(f'Part 1 values on top of stacks: {part1_answer}')
+        print(f'Part 2 values on top of stacks: {part2_answer}')
+        exit(0)
+
     if len(argv) != 3:
-        print("ERROR: expected 2 arguments (starting state file, instructions file)", file=stderr)
+        print("ERROR: expected 2 arguments (starting state file, instructions file) [--both]", file=stderr)
         exit(1)
 
     part1 = input("Do you want part1 behavior (Y/N)?: ")
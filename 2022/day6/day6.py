@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 
-from sys import argv, exit, stderr
+import mmap
+from os import fstat
+from typing import Dict, Iterable, BinaryIO
+from sys import argv, exit, stderr, stdin
 
 expected_args = 2
 
+DEFAULT_CHUNK_SIZE = 1 << 16
+
 
 def solver(buffer: str, pointer2start: int) -> int:
     pointer1, pointer2 = 0, pointer2start
@@ -16,15 +21,119 @@ def solver(buffer: str, pointer2start: int) -> int:
     return pointer2
 
 
-def main(input_file: str):
-    with open(input_file, 'r') as infile:
-        buffer = infile.read()
-        print(f'Part 1 answer: {solver(buffer, 4)}')
-        print(f'Part 2 answer: {solver(buffer, 14)}')
+class MarkerWindow(object):
+    '''Sliding window over a byte stream that knows in O(1) whether its last `size` bytes are all different.
+    It keeps a count per byte value and a running number of duplicates, plus a ring buffer of the
+    window's bytes so the outgoing byte is known without looking back at the input'''
+
+    def __init__(self, size: int):
+        self.size = size
+        self.counts = [0] * 256
+        self.duplicates = 0
+        self.ring = bytearray(size)
+        self.seen = 0
+
+    def push(self, byte: int) -> bool:
+        '''Adds a byte, dropping the oldest one if the window is full. True if the window is now a marker'''
+        counts = self.counts
+        slot = self.seen % self.size
+        if self.seen >= self.size:
+            old = self.ring[slot]
+            if counts[old] >= 2:
+                self.duplicates -= 1
+            counts[old] -= 1
+        if counts[byte]:
+            self.duplicates += 1
+        counts[byte] += 1
+        self.ring[slot] = byte
+        self.seen += 1
+        return self.seen >= self.size and not self.duplicates
+
+
+def find_markers(data: bytes, window_sizes: Iterable[int]) -> Dict[int, int]:
+    '''Offset of the first marker for every window size in one pass, with the same results as `solver`
+    (including its quirks: a window ending on the last byte isn't checked, and no marker gives
+    max(len(data), size))'''
+    active = [MarkerWindow(size) for size in set(window_sizes)]
+    result = {window.size: max(len(data), window.size) for window in active}
+    for pos in range(len(data) - 1):
+        byte = data[pos]
+        ind = 0
+        while ind < len(active):
+            window = active[ind]
+            if window.push(byte):  # found: swap-remove it so the rest keep going
+                result[window.size] = pos + 1
+                active[ind] = active[-1]
+                active.pop()
+            else:
+                ind += 1
+        if not active:
+            break
+    return result
+
+
+def stream_markers(stream: BinaryIO, window_sizes: Iterable[int], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[int, int]:
+    '''Same results as `find_markers`, reading `stream` in fixed-size chunks with the window state carried
+    across chunk boundaries. Reading stops as soon as every marker is found. Each byte is only pushed once
+    the next one has been read, which keeps the rule that a window ending on the last byte doesn't count'''
+    active = [MarkerWindow(size) for size in set(window_sizes)]
+    result = {}
+    pos = 0
+    held = None
+    while active:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        for byte in chunk:
+            if held is not None:
+                ind = 0
+                while ind < len(active):
+                    window = active[ind]
+                    if window.push(held):  # found: swap-remove it so the rest keep going
+                        result[window.size] = pos
+                        active[ind] = active[-1]
+                        active.pop()
+                    else:
+                        ind += 1
+                if not active:
+                    break
+            held = byte
+            pos += 1
+    for window in active:  # never found, `pos` is now the length of the whole stream
+        result[window.size] = max(pos, window.size)
+    return result
+
+
+def mmap_markers(input_file: str, window_sizes: Iterable[int]) -> Dict[int, int]:
+    '''`find_markers` over a memory-mapped file, so only the pages the search reaches get read'''
+    with open(input_file, 'rb') as infile:
+        if not fstat(infile.fileno()).st_size:  # empty files can't be mapped
+            return find_markers(b'', window_sizes)
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return find_markers(data, window_sizes)
+
+
+def main(input_file: str, mode: str = ''):
+    window_sizes = (4, 14)
+    if input_file == '-':
+        markers = stream_markers(stdin.buffer, window_sizes)
+    elif mode == '--mmap':
+        markers = mmap_markers(input_file, window_sizes)
+    else:
+        with open(input_file, 'rb') as infile:
+            if mode == '--stream':
+                markers = stream_markers(infile, window_sizes)
+            else:
+                markers = find_markers(infile.read(), window_sizes)
+    print(f'Part 1 answer: {markers[4]}')
+    print(f'Part 2 answer: {markers[14]}')
 
 
 if __name__ == '__main__':
-    if len(argv) != expected_args:
-        print(f"ERROR: expected {expected_args - 1} arguments ()", file=stderr)
+    modes = {'--stream', '--mmap'}
+    args = [arg for arg in argv if arg not in modes]
+    chosen = [arg for arg in argv if arg in modes]
+    if len(args) != expected_args or len(chosen) > 1:
+        print(f"ERROR: expected {expected_args - 1} arguments (input_file or - for stdin, [--stream | --mmap])", file=stderr)
         exit(1)
-    main(argv[1])
+    main(args[1], chosen[0] if chosen else '')
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from sys import argv, exit, stderr
 from collections import defaultdict
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Dict, Iterable
 from dataclasses import dataclass, field
 
 expected_args = 2
@@ -21,8 +21,9 @@ class File:
 class Dir:
     """Class that houses a directory"""
     name: str
-    parent_name: str = None
+    parent: Dir = None
     files: dict = field(default_factory=defaultdict)
+    cached_size: int = None
 
     def files_in_dir(self) -> List[Union[File, Dir]]:
         '''Gives all files living in a current directory. subdirectories are included'''
@@ -35,8 +36,10 @@ class Dir:
         return result
 
     def total_space_used(self) -> int:
-        '''Unlike `size` below, this calculates the total space used (so it double counts)'''
-        return sum(file.size for file in self.files_in_dir() if isinstance(file, File))
+        '''Total size of everything under this directory, read from the cache filled by `compute_sizes`'''
+        if self.cached_size is None:
+            compute_sizes(self)
+        return self.cached_size
 
 
 class InvalidDirectoryException(Exception):
@@ -45,20 +48,32 @@ class InvalidDirectoryException(Exception):
         super().__init__(message)
 
 
+def compute_sizes(root: Dir) -> List[Tuple[Dir, int]]:
+    '''Single post-order pass over the tree that caches every directory's cumulative size.
+    Returns (directory, size) pairs for `root` and all of its subdirectories'''
+    result = []
+    stack = [(root, False)]
+    while stack:
+        directory, children_done = stack.pop()
+        if children_done:
+            directory.cached_size = sum(
+                file.cached_size if isinstance(file, Dir) else file.size
+                for file in directory.files.values()
+            )
+            result.append((directory, directory.cached_size))
+            continue
+        stack.append((directory, True))
+        stack.extend((file, False) for file in directory.files.values() if isinstance(file, Dir))
+    return result
+
+
 def size(en: Union[File, Dir]) -> int:
     '''Gets the size of a given File or Directory, including subdirectories'''
-    def loop(total: int, left: List[Union[File, Dir]]) -> int:
-        '''This function uses total as an accumulator to be tail-recursive'''
-        rest = left[1:]
-        if not left:
-            return total
-        match left[0]:
-            case File(_, sz):
-                return loop(total + sz, rest)
-            case Dir(_, _, fls):
-                rest.extend(fls.values())
-                return loop(total, rest)
-    return loop(0, [en])
+    match en:
+        case File(_, sz):
+            return sz
+        case Dir():
+            return en.total_space_used()
 
 
 def process_lines(input_file: str) -> List[Tuple[str, List[str]]]:
@@ -82,7 +97,7 @@ def build_directory_structure(commands: List[Tuple[str, List[str]]]) -> Dir:
                 case "/":
                     working_directory = root_dir
                 case "..":
-                    working_directory = working_directory.parent_name
+                    working_directory = working_directory.parent
                 case _:  # this means we have a target to go to
                     if destination in working_directory.files:
                         working_directory = working_directory.files[destination]
@@ -98,35 +113,99 @@ def build_directory_structure(commands: List[Tuple[str, List[str]]]) -> Dir:
     return root_dir
 
 
+class StreamingFilesystem:
+    '''Builds the directory tree one terminal line at a time. Directories are indexed by their full path
+    so `cd` is a dict lookup, and every file size is pushed up to all ancestors as soon as it is listed,
+    so directory sizes are final as soon as the input ends'''
+
+    def __init__(self):
+        self.root = Dir(name="/", cached_size=0)
+        self.index: Dict[str, Dir] = {"/": self.root}
+        self.cwd = "/"
+
+    @staticmethod
+    def join(path: str, name: str) -> str:
+        return f'{path}{name}' if path == "/" else f'{path}/{name}'
+
+    @staticmethod
+    def parent_path(path: str) -> str:
+        return path.rpartition("/")[0] or "/"
+
+    def feed(self, line: str):
+        '''Process a single line of the terminal log'''
+        parts = line.split()
+        if not parts:
+            return
+        if parts[0] == "$":
+            if parts[1] == "cd":
+                self.cd(parts[2])
+            return  # `ls` needs no handling; its output lines are processed as they arrive
+        working_directory = self.index[self.cwd]
+        size, name = parts
+        if name in working_directory.files:  # directory listed twice, don't double count
+            return
+        if size == 'dir':
+            child = Dir(name, working_directory, cached_size=0)
+            working_directory.files[name] = child
+            self.index[self.join(self.cwd, name)] = child
+        else:
+            sz = int(size)
+            working_directory.files[name] = File(name, sz)
+            ancestor = working_directory
+            while ancestor is not None:
+                ancestor.cached_size += sz
+                ancestor = ancestor.parent
+
+    def cd(self, destination: str):
+        match destination:
+            case "/":
+                self.cwd = "/"
+            case "..":
+                self.cwd = self.parent_path(self.cwd)
+            case _:
+                target = self.join(self.cwd, destination)
+                if target not in self.index:
+                    raise InvalidDirectoryException(f'No directory {destination} in {self.index[self.cwd]}')
+                self.cwd = target
+
+    def du(self, path: str = "/") -> int:
+        '''Total size of everything under `path`'''
+        if path not in self.index:
+            raise InvalidDirectoryException(f'No directory {path}')
+        return self.index[path].cached_size
+
+    def dir_sizes(self) -> Dict[str, int]:
+        return {path: directory.cached_size for path, directory in self.index.items()}
+
+
+def stream_directory_structure(lines: Iterable[str]) -> StreamingFilesystem:
+    fs = StreamingFilesystem()
+    for line in lines:
+        fs.feed(line)
+    return fs
+
+
 def main(input_file: str):
 
-    commands = process_lines(input_file)
     try:
-        root_dir = build_directory_structure(commands)
+        with open(input_file, 'r') as infile:
+            fs = stream_directory_structure(infile)
     except InvalidDirectoryException as e:
         print(e)
         exit(1)
 
-    total = 0
     total_disk_space = 70_000_000
 
-    for file in root_dir.files_in_dir():
-        if isinstance(file, Dir):
-            sz = file.total_space_used()
-            if sz <= 100_000:
-                total += sz
-    print(f'Part 1 total: {total}')
+    # sizes were propagated while reading, so both parts just read from them
+    dir_sizes = fs.dir_sizes().values()
 
-    free_space = total_disk_space - root_dir.total_space_used()
+    total = sum(sz for sz in dir_sizes if sz <= 100_000)
+    print(f'Part 1 total: {total}')
 
-    # create a list of all folders we could delete to create enough update space
-    can_be_freed = [
-        file for file in root_dir.files_in_dir()
-        if isinstance(file, Dir) and file.total_space_used() + free_space >= 30_000_000
-    ]
+    free_space = total_disk_space - fs.du()
 
-    # find the size of the smallest folder that fits the criterion
-    print(f'Part 2: {min(file.total_space_used() for file in can_be_freed)}')
+    # find the size of the smallest folder we could delete to create enough update space
+    print(f'Part 2: {min(sz for sz in dir_sizes if sz + free_space >= 30_000_000)}')
 
 
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 
-from typing import List
+import mmap
+from typing import List, Tuple, Iterable
 from sys import argv, exit, stderr
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the --numpy mode
+    np = None
+
 expected_args = 2
 
 
@@ -95,7 +101,167 @@ def evaluate_tree_scores(tree_grid: List[List[int]]) -> int:
     return highest_score
 
 
-def main(input_file: str):
+def _sweep(heights: List[int], line: Iterable[int], visible: bytearray, scores: List[int]):
+    '''Looks along one line of the forest from its first cell. A running maximum says which trees can be
+    seen from that edge, and a monotonic stack of still-unblocked trees gives each tree's view distance back
+    towards that edge (the nearest earlier tree at least as tall, or the edge itself)'''
+    tallest = -1
+    stack: List[Tuple[int, int]] = []  # (height, position along the line), heights strictly decreasing
+    for pos, idx in enumerate(line):
+        height = heights[idx]
+        if height > tallest:
+            visible[idx] = 1
+            tallest = height
+        while stack and stack[-1][0] < height:
+            stack.pop()
+        scores[idx] *= pos - stack[-1][1] if stack else pos
+        stack.append((height, pos))
+
+
+def survey_forest(tree_grid: List[List[int]]) -> Tuple[int, int]:
+    '''Both parts in four linear sweeps over each row and column, instead of walking out from every tree.
+    Returns (number of visible trees, highest scenic score)'''
+    rows, cols = len(tree_grid), len(tree_grid[0])
+    heights = [height for row in tree_grid for height in row]
+    visible = bytearray(rows * cols)
+    scores = [1] * (rows * cols)
+    for row in range(rows):
+        line = range(row * cols, (row + 1) * cols)
+        _sweep(heights, line, visible, scores)
+        _sweep(heights, reversed(line), visible, scores)
+    for col in range(cols):
+        line = range(col, rows * cols, cols)
+        _sweep(heights, line, visible, scores)
+        _sweep(heights, reversed(line), visible, scores)
+    return sum(visible), max(scores)
+
+
+def load_forest_array(input_file: str):
+    '''Maps the digit file straight into a (rows, cols) uint8 array of ASCII digits, without building
+    per-tree Python objects. The array is a strided view over the mapped file that skips the line endings
+    (\n or \r\n), so the file stays on disk and a last row without a newline needs no copy.
+    Comparisons work on the ASCII codes directly since '0'..'9' keep their order'''
+    with open(input_file, 'rb') as infile:
+        buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    newline = buffer.find(b'\n')
+    if newline == -1:  # single row, no newline at all
+        return raw[:len(raw) - raw[-1:].tobytes().count(b'\r')].reshape(1, -1)
+    crlf = newline > 0 and raw[newline - 1] == ord('\r')
+    cols = newline - crlf
+    stride = newline + 1
+    full_rows, leftover = divmod(len(raw), stride)
+    if leftover not in (0, cols, cols + crlf) or buffer.find(b'\n', full_rows * stride) != -1:
+        raise ValueError(f'{input_file}: rows are not all {cols} trees long')
+    rows = full_rows + (leftover != 0)
+
+    endings = np.lib.stride_tricks.as_strided(raw[newline:], shape=(full_rows,), strides=(stride,))
+    if (endings != ord('\n')).any():
+        raise ValueError(f'{input_file}: rows are not all {cols} trees long')
+    return np.lib.stride_tricks.as_strided(raw, shape=(rows, cols), strides=(stride, 1), writeable=False)
+
+
+class _BandScanner(object):
+    '''Scratch buffers for scanning one band of the forest "from the left edge", reused for every band and
+    direction so the working memory is a few times the band size, whatever the size of the forest'''
+
+    def __init__(self, shape: Tuple[int, int]):
+        self.columns = np.arange(shape[1], dtype=np.int32)
+        self.running = np.empty(shape, dtype=np.int32)
+        self.nearest = np.empty(shape, dtype=np.int32)
+        self.mask = np.empty(shape, dtype=bool)
+        self.tallest = np.empty(shape, dtype=np.uint8)
+
+    def scan(self, band, visible, distances) -> None:
+        '''ORs into `visible` the trees seen from the left edge of `band`, and writes into `distances`
+        how far each tree can see towards that edge. The outputs may be (reversed) views'''
+        count, width = band.shape
+        columns, running, nearest, mask, tallest = (
+            self.columns[:width], self.running[:count, :width], self.nearest[:count, :width],
+            self.mask[:count, :width], self.tallest[:count, :width],
+        )
+        # tallest tree strictly before each cell; 0 sits below every ASCII digit, so edge trees always count
+        np.maximum.accumulate(band, axis=1, out=tallest)
+        tallest[:, 1:] = tallest[:, :-1]
+        tallest[:, 0] = 0
+        np.greater(band, tallest, out=mask)
+        visible |= mask
+
+        # for each height, the column of the nearest earlier tree at least that tall (0 = the edge itself),
+        # then every tree picks the answer for its own height
+        for height in range(ord('0'), ord('9') + 1):
+            np.equal(band, height, out=mask)
+            if not mask.any():
+                continue
+            np.greater_equal(band, height, out=mask)
+            running.fill(0)
+            np.copyto(running, columns, where=mask)
+            np.maximum.accumulate(running, axis=1, out=running)
+            nearest[:, 1:] = running[:, :-1]
+            nearest[:, 0] = 0
+            np.subtract(columns, nearest, out=nearest)
+            np.equal(band, height, out=mask)
+            np.copyto(distances, nearest, where=mask, casting='unsafe')
+
+
+def survey_forest_numpy(grid, band_cells: int = 1 << 20) -> Tuple[int, int]:
+    '''Vectorized version of `survey_forest` for a uint8 array of heights.
+    Rows are scanned in bands of about `band_cells` trees for the left/right directions, keeping only the
+    left * right view product (uint32 when it fits) and a packed visibility bitmap for the whole forest.
+    Columns are then scanned in bands for up/down and combined with those, so peak memory is a small
+    multiple of the grid itself. Returns (number of visible trees, highest scenic score)'''
+    if np is None:
+        raise ImportError('numpy is required for the vectorized forest survey')
+    rows, cols = grid.shape
+    # left * right is at most ((cols - 1) / 2) ** 2
+    row_dtype = np.uint32 if ((cols - 1) // 2 + 1) ** 2 <= np.iinfo(np.uint32).max else np.uint64
+    row_scores = np.empty((rows, cols), dtype=row_dtype)
+    row_visible = np.empty((rows, (cols + 7) // 8), dtype=np.uint8)
+
+    band_rows = max(1, band_cells // max(cols, 1))
+    scanner = _BandScanner((min(band_rows, rows), cols))
+    visible = np.empty((min(band_rows, rows), cols), dtype=bool)
+    left = np.empty((min(band_rows, rows), cols), dtype=np.uint32)
+    right = np.empty_like(left)
+    for start in range(0, rows, band_rows):
+        band = grid[start:start + band_rows]
+        count = band.shape[0]
+        band_visible, band_left, band_right = visible[:count], left[:count], right[:count]
+        band_visible.fill(False)
+        scanner.scan(band, band_visible, band_left)
+        scanner.scan(band[:, ::-1], band_visible[:, ::-1], band_right[:, ::-1])
+        np.multiply(band_left, band_right, out=row_scores[start:start + count], casting='unsafe')
+        row_visible[start:start + count] = np.packbits(band_visible, axis=1)
+
+    # column bands are a multiple of 8 wide so they line up with the packed visibility bytes
+    band_cols = max(8, band_cells // max(rows, 1) // 8 * 8)
+    scanner = _BandScanner((min(band_cols, cols), rows))
+    visible = np.empty((min(band_cols, cols), rows), dtype=bool)
+    up = np.empty((min(band_cols, cols), rows), dtype=np.uint32)
+    down = np.empty_like(up)
+    total_visible, best_score = 0, 0
+    for start in range(0, cols, band_cols):
+        band = np.ascontiguousarray(grid[:, start:start + band_cols].T)
+        count = band.shape[0]
+        band_visible, band_up, band_down = visible[:count], up[:count], down[:count]
+        band_visible[:] = np.unpackbits(row_visible[:, start // 8:(start + count + 7) // 8], axis=1)[:, :count].T
+        scanner.scan(band, band_visible, band_up)
+        scanner.scan(band[:, ::-1], band_visible[:, ::-1], band_down[:, ::-1])
+        total_visible += int(np.count_nonzero(band_visible))
+        scores = band_up.astype(np.uint64)
+        scores *= band_down
+        scores *= row_scores[:, start:start + count].T
+        best_score = max(best_score, int(scores.max()))
+    return total_visible, best_score
+
+
+def main(input_file: str, use_numpy: bool = False):
+    if use_numpy:
+        visible, best_score = survey_forest_numpy(load_forest_array(input_file))
+        print(f'part 1: {visible}')
+        print(f'part 2: {best_score}')
+        return
+
     with open(input_file, 'r') as infile:
         tree_grid: List[List[int]] = []
 
@@ -107,12 +273,15 @@ def main(input_file: str):
                 row.append(int(val))
             tree_grid.append(row)
 
-        print(f'part 1: {count_visible_trees(tree_grid)}')
-        print(f'part 2: {evaluate_tree_scores(tree_grid)}')
+        visible, best_score = survey_forest(tree_grid)
+        print(f'part 1: {visible}')
+        print(f'part 2: {best_score}')
 
 
 if __name__ == "__main__":
-    if len(argv) != expected_args:
-        print(f'ERROR: expected {expected_args - 1} arguments (input_file)', file=stderr)
+    use_numpy = '--numpy' in argv
+    args = [arg for arg in argv if arg != '--numpy']
+    if len(args) != expected_args:
+        print(f'ERROR: expected {expected_args - 1} arguments (input_file [--numpy])', file=stderr)
         exit(1)
-    main(argv[1])
+    main(args[1], use_numpy)
@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
 from enum import Enum
-from typing import Set, Tuple, List, Union
+from typing import Set, Tuple, List, Union, Dict, Iterable
 from sys import argv, exit, stderr
 
 expected_args = 2
 
+LETTER_TO_DELTA = {'U': (0, 1), 'D': (0, -1), 'L': (-1, 0), 'R': (1, 0)}
+
 
 class Direction(Enum):
     UP = 0
@@ -103,11 +108,265 @@ def run_simulation(instructions: List[Tuple[str, int]], num_nodes: int) -> int:
     return len(rope_snake[-1].get_visited())
 
 
-def main(input_file: str):
-    instructions = parse_input_file(input_file)
+def _check_tracked(tracked: Iterable[int], num_nodes: int) -> List[int]:
+    '''Tracked knots have to be followers, 1..num_nodes-1 (knot 0 is the head)'''
+    tracked = list(tracked)
+    for ind in tracked:
+        if not 1 <= ind < num_nodes:
+            raise ValueError(f'Can only track knots 1 to {num_nodes - 1} of a {num_nodes} knot rope, got {ind}')
+    return tracked
+
+
+def run_multi_simulation(instructions: List[Tuple[str, int]], num_nodes: int, tracked: Iterable[int]) -> Dict[int, int]:
+    '''Simulates one rope of `num_nodes` knots and returns how many cells each tracked knot visited
+    (knot 0 is the head, so tracked knots are 1..num_nodes-1). Knot k of a long rope moves exactly like
+    the tail of a rope of k + 1 knots, so every rope length up to `num_nodes` is answered by this single pass'''
+    visited: Dict[int, Set[Tuple[int, int]]] = {ind: {(0, 0)} for ind in _check_tracked(tracked, num_nodes)}
+    xs = [0] * num_nodes
+    ys = [0] * num_nodes
+
+    for dr, amt in instructions:
+        dx, dy = LETTER_TO_DELTA[dr.upper()]
+        for _ in range(amt):
+            xs[0] += dx
+            ys[0] += dy
+            for ind in range(1, num_nodes):
+                x_dist = xs[ind - 1] - xs[ind]
+                y_dist = ys[ind - 1] - ys[ind]
+                if abs(x_dist) < 2 and abs(y_dist) < 2:
+                    break  # this knot stays put, so nothing behind it moves either
+                xs[ind] += (x_dist > 0) - (x_dist < 0)
+                ys[ind] += (y_dist > 0) - (y_dist < 0)
+                if ind in visited:
+                    visited[ind].add((xs[ind], ys[ind]))
+    return {ind: len(cells) for ind, cells in visited.items()}
+
+
+def parse_moves(input_file: str) -> array:
+    '''Decodes the instructions once into a flat array of (dx, dy, amount) triples'''
+    moves = array('i')
+    with open(input_file, 'r') as infile:
+        for line in infile:
+            line_items = line.split()
+            if line_items:
+                moves.extend(LETTER_TO_DELTA[line_items[0].upper()])
+                moves.append(int(line_items[1]))
+    return moves
+
+
+TILE_SHIFT = 6  # visited tiles cover 64x64 cells
+TILE_MASK = (1 << TILE_SHIFT) - 1
+TILE_BYTES = (1 << (2 * TILE_SHIFT)) // 8
+
+
+class VisitedGrid(object):
+    '''Sparse bitmap of visited cells: fixed 64x64 bit tiles, created only where the rope goes and keyed by
+    (x >> 6, y >> 6), so memory follows the cells visited rather than the area of their bounding box'''
+
+    def __init__(self) -> VisitedGrid:
+        self.tiles: Dict[Tuple[int, int], bytearray] = {}
+
+    def add(self, x: int, y: int) -> None:
+        key = (x >> TILE_SHIFT, y >> TILE_SHIFT)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.tiles[key] = bytearray(TILE_BYTES)
+        bit = ((y & TILE_MASK) << TILE_SHIFT) | (x & TILE_MASK)
+        tile[bit >> 3] |= 1 << (bit & 7)
+
+    def __contains__(self, cell: Tuple[int, int]) -> bool:
+        x, y = cell
+        tile = self.tiles.get((x >> TILE_SHIFT, y >> TILE_SHIFT))
+        bit = ((y & TILE_MASK) << TILE_SHIFT) | (x & TILE_MASK)
+        return tile is not None and bool(tile[bit >> 3] & (1 << (bit & 7)))
+
+    def __len__(self) -> int:
+        return sum(int.from_bytes(tile, 'little').bit_count() for tile in self.tiles.values())
+
+
+def run_compact_simulation(moves: array, num_nodes: int, tracked: Iterable[int]) -> Dict[int, int]:
+    '''Same as `run_multi_simulation`, but knots live in one flat array (x at 2k, y at 2k + 1),
+    moves come pre-decoded from `parse_moves` and visits go into bitmaps instead of sets of tuples'''
+    visited: Dict[int, VisitedGrid] = {ind: VisitedGrid() for ind in _check_tracked(tracked, num_nodes)}
+    for grid in visited.values():
+        grid.add(0, 0)
+    knots = array('i', [0]) * (2 * num_nodes)
+
+    for step in range(0, len(moves), 3):
+        dx, dy, amt = moves[step], moves[step + 1], moves[step + 2]
+        for _ in range(amt):
+            knots[0] += dx
+            knots[1] += dy
+            for ind in range(2, 2 * num_nodes, 2):
+                x_dist = knots[ind - 2] - knots[ind]
+                y_dist = knots[ind - 1] - knots[ind + 1]
+                if -2 < x_dist < 2 and -2 < y_dist < 2:
+                    break  # this knot stays put, so nothing behind it moves either
+                knots[ind] += (x_dist > 0) - (x_dist < 0)
+                knots[ind + 1] += (y_dist > 0) - (y_dist < 0)
+                if ind // 2 in visited:
+                    visited[ind // 2].add(knots[ind], knots[ind + 1])
+    return {ind: len(grid) for ind, grid in visited.items()}
+
+
+Segment = Tuple[int, int, int]  # (dx, dy, number of unit steps)
 
-    print(f'Part 1: {run_simulation(instructions, 2)}')
-    print(f'Part 2: {run_simulation(instructions, 10)}')
+
+def _append_segment(path: List[Segment], dx: int, dy: int, amt: int) -> None:
+    if path and path[-1][0] == dx and path[-1][1] == dy:
+        path[-1] = (dx, dy, path[-1][2] + amt)
+    else:
+        path.append((dx, dy, amt))
+
+
+def follow_path(leader: List[Segment]) -> List[Segment]:
+    '''Given the path of one knot as segments, works out the path of the knot behind it.
+    Both start at the origin. Once the follower makes the same step as the leader, their offset
+    is back to what it was, so it keeps copying the leader for the rest of the segment'''
+    follower: List[Segment] = []
+    lx = ly = fx = fy = 0
+    for dx, dy, amt in leader:
+        while amt:
+            lx += dx
+            ly += dy
+            amt -= 1
+            x_dist = lx - fx
+            y_dist = ly - fy
+            if -2 < x_dist < 2 and -2 < y_dist < 2:
+                continue
+            mx = (x_dist > 0) - (x_dist < 0)
+            my = (y_dist > 0) - (y_dist < 0)
+            fx += mx
+            fy += my
+            _append_segment(follower, mx, my, 1)
+            if (mx, my) == (dx, dy) and amt:  # trailing straight: copy the rest of the segment in one go
+                lx += dx * amt
+                ly += dy * amt
+                fx += dx * amt
+                fy += dy * amt
+                _append_segment(follower, dx, dy, amt)
+                amt = 0
+    return follower
+
+
+def _merge_intervals(lines: Dict[int, List[Tuple[int, int]]]) -> Dict[int, Tuple[List[int], List[int]]]:
+    '''Merges the inclusive intervals on each line into sorted, disjoint (starts, ends) lists'''
+    merged = {}
+    for key, intervals in lines.items():
+        starts, ends = [], []
+        for start, end in sorted(intervals):
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        merged[key] = (starts, ends)
+    return merged
+
+
+def _covers(line: Tuple[List[int], List[int]], value: int) -> bool:
+    starts, ends = line
+    ind = bisect_right(starts, value) - 1
+    return ind >= 0 and ends[ind] >= value
+
+
+class _Fenwick(object):
+    '''Binary indexed tree of counts over positions 0..size-1'''
+
+    def __init__(self, size: int) -> _Fenwick:
+        self.tree = [0] * (size + 1)
+
+    def add(self, ind: int, delta: int) -> None:
+        ind += 1
+        while ind < len(self.tree):
+            self.tree[ind] += delta
+            ind += ind & -ind
+
+    def prefix(self, ind: int) -> int:
+        '''Sum over positions 0..ind-1'''
+        total = 0
+        while ind > 0:
+            total += self.tree[ind]
+            ind -= ind & -ind
+        return total
+
+
+def _count_crossings(rows: Dict[int, Tuple[List[int], List[int]]], cols: Dict[int, Tuple[List[int], List[int]]]) -> int:
+    '''Number of cells covered by both a row interval and a column interval. Sweeps across x: a row interval
+    switches its row on at its start and off after its end, and each column interval counts the rows switched
+    on within its y range with a Fenwick tree, so this is O(K log K) for K intervals'''
+    row_keys = sorted(rows)
+    row_index = {row: ind for ind, row in enumerate(row_keys)}
+    # (x, kind, ...): kind 0 switches a row on/off, kind 1 is a column query; updates at x come first
+    events = []
+    for row, (starts, ends) in rows.items():
+        for start, end in zip(starts, ends):
+            events.append((start, 0, row_index[row], 1))
+            events.append((end + 1, 0, row_index[row], -1))
+    for col, (starts, ends) in cols.items():
+        for start, end in zip(starts, ends):
+            events.append((col, 1, start, end))
+    events.sort()
+
+    active = _Fenwick(len(row_keys))
+    crossings = 0
+    for _, kind, first, second in events:
+        if kind == 0:
+            active.add(first, second)
+        else:
+            crossings += active.prefix(bisect_right(row_keys, second)) - active.prefix(bisect_left(row_keys, first))
+    return crossings
+
+
+def count_visited(path: List[Segment]) -> int:
+    '''Number of distinct cells on a path starting at the origin. Horizontal and vertical segments are kept as
+    whole intervals per row/column, and cells covered by both are found with a sweep (`_count_crossings`).
+    Diagonal steps are short in practice, so they are kept as single cells'''
+    rows: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    cols: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    points: Set[Tuple[int, int]] = {(0, 0)}
+    x = y = 0
+    for dx, dy, amt in path:
+        if dy == 0:
+            rows[y].append((min(x, x + dx * amt), max(x, x + dx * amt)))
+        elif dx == 0:
+            cols[x].append((min(y, y + dy * amt), max(y, y + dy * amt)))
+        else:
+            points.update((x + dx * step, y + dy * step) for step in range(1, amt + 1))
+        x += dx * amt
+        y += dy * amt
+
+    rows, cols = _merge_intervals(rows), _merge_intervals(cols)
+    total = sum(end - start + 1 for starts, ends in rows.values() for start, end in zip(starts, ends))
+    total += sum(end - start + 1 for starts, ends in cols.values() for start, end in zip(starts, ends))
+    total -= _count_crossings(rows, cols)
+    for px, py in points:
+        if not (py in rows and _covers(rows[py], px)) and not (px in cols and _covers(cols[px], py)):
+            total += 1
+    return total
+
+
+def run_segment_simulation(moves: array, num_nodes: int, tracked: Iterable[int]) -> Dict[int, int]:
+    '''Same answers as `run_compact_simulation`, but every knot's path is handled a segment at a time,
+    so the work grows with the number of instructions rather than with the distance travelled'''
+    tracked = set(_check_tracked(tracked, num_nodes))
+    path: List[Segment] = []
+    for step in range(0, len(moves), 3):
+        if moves[step + 2]:
+            _append_segment(path, moves[step], moves[step + 1], moves[step + 2])
+
+    result = {}
+    for ind in range(1, max(tracked, default=0) + 1):
+        path = follow_path(path)
+        if ind in tracked:
+            result[ind] = count_visited(path)
+    return result
+
+
+def main(input_file: str):
+    visited = run_segment_simulation(parse_moves(input_file), 10, (1, 9))
+    print(f'Part 1: {visited[1]}')
+    print(f'Part 2: {visited[9]}')
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
-from typing import Tuple, Optional
+from collections import deque
+from typing import Tuple, Optional, Dict, List, Iterable, TextIO
 from sys import argv, stderr, exit
 
 FORWARDS_MAP = {
@@ -15,71 +16,99 @@ FORWARDS_MAP = {
     "nine": "9",
 }
 
-BACKWARDS_MAP = {
-    "eno": "1",
-    "owt": "2",
-    "eerht": "3",
-    "ruof": "4",
-    "evif": "5",
-    "xis": "6",
-    "neves": "7",
-    "thgie": "8",
-    "enin": "9",
-}
+DIGIT_PATTERNS = {**FORWARDS_MAP, **{str(digit): str(digit) for digit in range(10)}}
 
-def _find_first_digit(line: str, backwards: bool) -> Tuple[int, str]:
-    str_ind, str_char = _find_first_string_digit(line, backwards)
-    num_ind, num_char = _find_first_numerical_digit(line)
-    if num_ind is not None and str_ind is not None:
-        return (num_ind, num_char) if num_ind < str_ind else (str_ind, str_char)
-    elif num_ind is None:
-        return (str_ind, str_char)
-    elif str_ind is None:
-        return (num_ind, num_char)
-    else:
-        return (None, None)
+def build_automaton(patterns: Dict[str, str]) -> Tuple[List[Dict[str, int]], List[Tuple[Tuple[int, str], ...]]]:
+    '''Aho-Corasick automaton over `patterns`. Returns the full transition table (one dict per state;
+    a character missing from a state's dict goes back to the root) and, per state, the (length, value)
+    of every pattern that ends there, including ones found through failure links'''
+    goto: List[Dict[str, int]] = [{}]
+    outputs: List[List[Tuple[int, str]]] = [[]]
+    for pattern, value in patterns.items():
+        state = 0
+        for char in pattern:
+            if char not in goto[state]:
+                goto.append({})
+                outputs.append([])
+                goto[state][char] = len(goto) - 1
+            state = goto[state][char]
+        outputs[state].append((len(pattern), value))
 
-def _find_first_string_digit(line: str, backwards: bool) -> Optional[Tuple[int, str]]:
-    index1, index2 = 0, 5
-    if index2 > len(line):
-        index2 = len(line)
+    # breadth first, so each state's failure target is finished before the state itself
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        outputs[state].extend(outputs[fail[state]])
+        for char, nxt in goto[state].items():
+            target = fail[state]
+            while target and char not in goto[target]:
+                target = fail[target]
+            fail[nxt] = goto[target].get(char, 0) if goto[target].get(char, 0) != nxt else 0
+            queue.append(nxt)
+        # fill in the missing transitions from the failure state so scanning never follows links
+        for char, nxt in goto[fail[state]].items():
+            goto[state].setdefault(char, nxt)
+    return goto, [tuple(out) for out in outputs]
 
-    while index2 <= len(line):
-        if not backwards:
-            for key in FORWARDS_MAP.keys():
-                if line[index1:index2].startswith(key):
-                    return index1, FORWARDS_MAP[key]
-        else:
-            for key in BACKWARDS_MAP.keys():
-                if line[index1:index2].startswith(key):
-                    return index1, BACKWARDS_MAP[key]
-        index1 += 1
-        index2 += 1
-    return None, None
+DIGIT_AUTOMATON = build_automaton(DIGIT_PATTERNS)
 
-def _find_first_numerical_digit(line: str) -> Optional[Tuple[int, str]]:
+def scan_first_last(line: str) -> Tuple[Optional[str], Optional[str]]:
+    '''First and last digit (spelled out or numerical) in `line`, from one left-to-right pass.
+    Overlapping words like "eightwo" give both of their digits'''
+    goto, outputs = DIGIT_AUTOMATON
+    state = 0
+    first_start, first = len(line), None
+    last_start, last = -1, None
     for ind, char in enumerate(line):
-        try:
-            int(char)
-            return ind, char
-        except ValueError:
-            continue
-    return None, None
+        state = goto[state].get(char, 0)
+        for length, value in outputs[state]:
+            start = ind - length + 1
+            if start < first_start:
+                first_start, first = start, value
+            if start > last_start:
+                last_start, last = start, value
+    return first, last
 
 def find_two_digit_number(line: str) -> int:
-    result = ''
-    first_ind, first_char = _find_first_digit(line, False)
-    last_ind, last_char = _find_first_digit(line[::-1], True)
-    result += first_char
-    return int(result)
+    first_char, last_char = scan_first_last(line)
+    if first_char is None:  # no digits on this line at all
+        return 0
+    return int(first_char + last_char)
+
+def calibrate(lines: Iterable[str], outfile: Optional[TextIO] = None) -> int:
+    '''Sums the calibration value of every line in a single streaming pass, writing each line's value
+    to `outfile` (newline separated) as it goes if one is given'''
+    total = 0
+    separator = ''
+    for line in lines:
+        value = find_two_digit_number(line.rstrip('\n'))
+        total += value
+        if outfile is not None:
+            outfile.write(f'{separator}{value}')
+            separator = '\n'
+    return total
 
 if __name__ == "__main__":
-    if len(argv) != 2:
-        print("ERROR: expected 1 argument (filename)", file=stderr)
+    args = argv[1:]
+    outfile_path = 'outfile.txt'
+    if '--no-outfile' in args:
+        args.remove('--no-outfile')
+        outfile_path = None
+    if '--outfile' in args:
+        ind = args.index('--outfile')
+        if ind + 1 >= len(args):
+            print("ERROR: --outfile needs a path", file=stderr)
+            exit(1)
+        outfile_path = args.pop(ind + 1)
+        args.pop(ind)
+    if len(args) != 1:
+        print("ERROR: expected 1 argument (filename) [--outfile path | --no-outfile]", file=stderr)
         exit(1)
 
-    with open(argv[1], 'r') as infile:
-        values = infile.read().splitlines()
-        with open('outfile.txt', 'w') as outfile:
-            outfile.write('\n'.join(map(lambda x: str(find_two_digit_number(x)), values)))
-        print(sum(map(lambda x: find_two_digit_number(x), values)))
+    with open(args[0], 'r') as infile:
+        if outfile_path is None:
+            print(calibrate(infile))
+        else:
+            with open(outfile_path, 'w', buffering=1 << 20) as outfile:
+                print(calibrate(infile, outfile))